@@ -1,7 +1,9 @@
 """The Sitemap plugin generates plain-text or XML sitemaps."""
 
+from contextlib import suppress
 from datetime import datetime
 import logging
+from operator import itemgetter
 import os.path
 import re
 from urllib.request import pathname2url
@@ -21,14 +23,14 @@ TXT_URL = "{0}/{1}\n"
 
 XML_URL = """
 <url>
-<loc>{0}/{1}</loc>
-<lastmod>{2}</lastmod>
-<changefreq>{3}</changefreq>
-<priority>{4}</priority>
-{translations}</url>
+<loc>%s/%s</loc>
+<lastmod>%s</lastmod>
+<changefreq>%s</changefreq>
+<priority>%s</priority>
+%s</url>
 """
 
-XML_TRANSLATION = """<xhtml:link rel="alternate" hreflang="{}" ref="{}/{}"/>
+XML_TRANSLATION = """<xhtml:link rel="alternate" hreflang="%s" ref="%s/%s"/>
 """
 
 XML_FOOTER = """
@@ -38,12 +40,49 @@ XML_FOOTER = """
 
 def format_date(date):
     """Format the date in the expected format."""
+    # isoformat() renders the same layout, UTC offset included, in one call
     if date.tzinfo:
-        tz = date.strftime("%z")
-        tz = tz[:-2] + ":" + tz[-2:]
-    else:
-        tz = "-00:00"
-    return date.strftime("%Y-%m-%dT%H:%M:%S") + tz
+        return date.isoformat(timespec="seconds")
+    return date.isoformat(timespec="seconds") + "-00:00"
+
+
+def clean_url(url):
+    """Strip a trailing 'index.html' from the URL."""
+    if url == "index.html":
+        return ""
+    if url.endswith("/index.html"):
+        return url[: -len("index.html")]
+    return url
+
+
+DEFAULT_RE_FLAGS = re.compile("").flags
+
+
+def compile_exclude(patterns):
+    """Compile the exclude patterns, merged into a single regex where possible."""
+    compiled = []
+    # Invalid entries were already reported by _check_config(); ignore them
+    # like other bad values
+    for pattern in patterns:
+        if not isinstance(pattern, str):
+            continue
+        try:
+            compiled.append(re.compile(pattern))
+        except re.error:
+            continue
+    # Only merge when it cannot change what the patterns match: numbered
+    # backreferences in later patterns would shift, and before Python 3.11 an
+    # inline global flag such as (?i) would apply to the whole alternation
+    if (
+        len(compiled) > 1
+        and not any(regex.groups for regex in compiled[1:])
+        and all(regex.flags == DEFAULT_RE_FLAGS for regex in compiled)
+    ):
+        try:
+            return [re.compile("|".join(f"(?:{regex.pattern})" for regex in compiled))]
+        except re.error:
+            pass
+    return compiled
 
 
 CHANGEFREQ_DEFAULTS = {
@@ -75,6 +114,10 @@ class SitemapGenerator:
         self.now = datetime.now()
         self.page_queue = []
         self._main_pelican = None
+        self._config = None
+        self._excluded = []
+        self._changefreqs = CHANGEFREQ_DEFAULTS
+        self._priorities = PRIORITY_DEFAULTS
 
     def init(self, pelican):
         """Initialize the plugin."""
@@ -85,6 +128,13 @@ class SitemapGenerator:
     def queue_page(self, path, context):
         """Queue one site page for later generation."""
         obj = context.get("article") or context.get("page")
+        # Drop private and unpublished content right away; index pages
+        # (obj is None) have neither attribute
+        if obj is not None and (
+            getattr(obj, "private", "") == "True"
+            or getattr(obj, "status", "published") != "published"
+        ):
+            return
         self.page_queue.append((path, obj))
 
     def finalize(self, pelican):
@@ -103,68 +153,115 @@ class SitemapGenerator:
         context = pelican.settings
         siteurl = context["SITEURL"]
         config = context.get("SITEMAP", {})
-        self._check_config(config)
-        excluded = config.get("exclude", ())
-        changefreqs = dict(CHANGEFREQ_DEFAULTS, **config.get("changefreqs", {}))
-        priorities = dict(PRIORITY_DEFAULTS, **config.get("priorities", {}))
+        self._load_config(config)
+        excluded = self._excluded
+        changefreqs = self._changefreqs
+        priorities = self._priorities
         fmt = config.get("format", "xml")
         is_xml = fmt == "xml"
         filename = os.path.join(output_path, "sitemap." + fmt)
 
+        # Written paths nearly always live under output_path; slicing off the
+        # prefix is much cheaper than a full os.path.relpath()
+        output_prefix = os.path.join(os.path.abspath(output_path), "")
+
         def to_url(path):
             nonlocal output_path
+            if path.startswith(output_prefix):
+                return pathname2url(path[len(output_prefix) :])
             return pathname2url(os.path.relpath(path, output_path))
 
-        def clean_url(url):
-            # Strip trailing 'index.html'
-            return re.sub(r"(?:^|(?<=/))index.html$", "", url)
-
-        def is_excluded(item):
+        def is_excluded(url):
             nonlocal excluded
-            url, obj = item
-            is_private = getattr(obj, "private", "") == "True"
-            is_hidden = getattr(obj, "status", "published") != "published"
-            return (
-                is_private
-                or is_hidden
-                or any(re.search(pattern, url) for pattern in excluded)
-            )
-
-        page_queue = [(clean_url(to_url(path)), obj) for path, obj in self.page_queue]
-        page_queue = [page for page in page_queue if not is_excluded(page)]
-        page_queue.sort(key=lambda i: i[0])
+            # Most sites configure no patterns; skip the generator setup then
+            return bool(excluded) and any(pattern.search(url) for pattern in excluded)
+
+        # Build and filter the queue in a single pass
+        page_queue = [
+            (url, obj)
+            for path, obj in self.page_queue
+            if not is_excluded(url := clean_url(to_url(path)))
+        ]
+        page_queue.sort(key=itemgetter(0))
+
+        # Format the whole document in one pipeline and write it out in one go
+        if is_xml:
+            lines = self._iter_xml(page_queue, siteurl, changefreqs, priorities)
+        else:
+            prefix = siteurl + "/"
+            # A list lets str.join() skip materializing a generator first
+            lines = [prefix + pageurl + "\n" for pageurl, _ in page_queue]
+
+        # Encode once, before truncating the previous sitemap, and bypass the
+        # text I/O layer
+        data = "".join(lines).encode("utf-8")
+        with open(filename, "wb") as fd:
+            fd.write(data)
 
-        with open(filename, "w", encoding="utf-8") as fd:
-            if is_xml:
-                fd.write(XML_HEADER)
-
-            for pageurl, obj in page_queue:
-                if not is_xml:
-                    fd.write(siteurl + "/" + pageurl + "\n")
-                    # That's it for txt. Short circuit the loop, gain an indent level.
-                    continue
+        log.info(f"sitemap: Written {filename!r}")
 
-                lastmod = format_date(
-                    getattr(obj, "modified", None)
-                    or getattr(obj, "date", None)
-                    or self.now
+    def _iter_xml(self, page_queue, siteurl, changefreqs, priorities):
+        # Map content classes to their configured (changefreq, priority),
+        # with the priority pre-rendered as it will appear in the output
+        article_defaults = (changefreqs["articles"], str(priorities["articles"]))
+        page_defaults = (changefreqs["pages"], str(priorities["pages"]))
+        index_defaults = (changefreqs["indexes"], str(priorities["indexes"]))
+        type_defaults = {
+            contents.Article: article_defaults,
+            contents.Page: page_defaults,
+        }
+        now = format_date(self.now)
+        trans_links = {}
+
+        def trans_link(trans):
+            # A translation is linked from each of its siblings; format it once
+            link = trans_links.get(id(trans))
+            if link is None:
+                link = trans_links[id(trans)] = XML_TRANSLATION % (
+                    trans.lang,
+                    siteurl,
+                    # save_as path is already output-relative
+                    clean_url(pathname2url(trans.save_as)),
                 )
-                content_type = (
-                    "articles"
+            return link
+
+        # Local names for the globals used per page in the loop below
+        _format_date = format_date
+        _XML_URL, _CHANGEFREQ_VALUES = XML_URL, CHANGEFREQ_VALUES
+
+        yield XML_HEADER
+        for pageurl, obj in page_queue:
+            if obj is None:
+                # Index pages have no content object, hence no metadata
+                yield _XML_URL % (siteurl, pageurl, now, *index_defaults, "")
+                continue
+
+            date = getattr(obj, "modified", None) or getattr(obj, "date", None)
+            lastmod = _format_date(date) if date else now
+            obj_defaults = type_defaults.get(type(obj))
+            if obj_defaults is None:
+                # Subclasses of Article/Page: resolve once per type. Index pages
+                # were handled above; other content types fall back to indexes
+                obj_defaults = type_defaults[type(obj)] = (
+                    article_defaults
                     if isinstance(obj, contents.Article)
-                    else "pages"
+                    else page_defaults
                     if isinstance(obj, contents.Page)
-                    else "indexes"
+                    else index_defaults
                 )
-
-                # see if changefreq specified in metadata headers; fall back to config
-                changefreq = getattr(obj, "changefreq", changefreqs[content_type])
-                if changefreq not in CHANGEFREQ_VALUES:
-                    log.error(f"sitemap: Invalid 'changefreqs' value: {changefreq!r}")
-                    changefreq = changefreqs[content_type]
-
-                # see if priority specified in metadata headers; fall back to config
-                priority_raw = getattr(obj, "priority", priorities[content_type])
+            default_changefreq, default_priority = obj_defaults
+
+            # see if changefreq specified in metadata headers; fall back to config
+            changefreq = getattr(obj, "changefreq", default_changefreq)
+            if changefreq not in _CHANGEFREQ_VALUES:
+                log.error(f"sitemap: Invalid 'changefreqs' value: {changefreq!r}")
+                changefreq = default_changefreq
+
+            # see if priority specified in metadata headers; fall back to config
+            priority_raw = getattr(obj, "priority", None)
+            if priority_raw is None:
+                priority = default_priority
+            else:
                 try:
                     priority = float(priority_raw)
                 except ValueError:
@@ -172,33 +269,41 @@ class SitemapGenerator:
                         "sitemap: Specify priority as a floating-point number, "
                         f"not the current value: {priority_raw!r}"
                     )
-                    priority = priorities[content_type]
-
-                translations = "".join(
-                    XML_TRANSLATION.format(
-                        trans.lang,
-                        siteurl,
-                        # save_as path is already output-relative
-                        clean_url(pathname2url(trans.save_as)),
-                    )
-                    for trans in getattr(obj, "translations", ())
-                )
+                    priority = default_priority
+
+            # Most pages have no translations; skip the join for those
+            obj_translations = getattr(obj, "translations", None)
+            translations = (
+                "".join([trans_link(trans) for trans in obj_translations])
+                if obj_translations
+                else ""
+            )
 
-                fd.write(
-                    XML_URL.format(
-                        siteurl,
-                        pageurl,
-                        lastmod,
-                        changefreq,
-                        priority,
-                        translations=translations,
-                    )
-                )
+            yield _XML_URL % (
+                siteurl,
+                pageurl,
+                lastmod,
+                changefreq,
+                priority,
+                translations,
+            )
 
-            if is_xml:
-                fd.write(XML_FOOTER)
+        yield XML_FOOTER
 
-        log.info(f"sitemap: Written {filename!r}")
+    def _load_config(self, config):
+        # Settings are re-read on changes, so only process a new SITEMAP dict
+        if config is self._config:
+            return
+        self._check_config(config)
+        self._excluded = compile_exclude(config.get("exclude", ()))
+        self._changefreqs = {**CHANGEFREQ_DEFAULTS, **config.get("changefreqs", {})}
+        self._priorities = {**PRIORITY_DEFAULTS, **config.get("priorities", {})}
+        # Convert once here rather than for every page; invalid values have
+        # been reported by _check_config()
+        for key, value in self._priorities.items():
+            with suppress(TypeError, ValueError):
+                self._priorities[key] = float(value)
+        self._config = config
 
     def _check_config(self, config):
         if not isinstance(config, dict):
@@ -229,6 +334,15 @@ class SitemapGenerator:
                 "sitemap: Invalid 'exclude' value: %r; must be a list of str",
                 exclude,
             )
+        for pattern in exclude:
+            if not isinstance(pattern, str):
+                # Already reported above
+                continue
+            try:
+                re.compile(pattern)
+            except re.error:
+                # A one-line error, not a traceback, for a config typo
+                log.error("sitemap: Invalid 'exclude' pattern: %r", pattern)  # noqa: TRY400
 
 
 generator = SitemapGenerator()
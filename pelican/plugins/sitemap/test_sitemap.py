@@ -22,7 +22,7 @@ class TestSitemap(unittest.TestCase):
     def tearDown(self):
         rmtree(self.output_path)
 
-    def _run_pelican(self, sitemap_format):
+    def _run_pelican(self, sitemap_format, **sitemap_config):
         settings = read_settings(
             override={
                 "PATH": TEST_DATA,
@@ -32,6 +32,7 @@ class TestSitemap(unittest.TestCase):
                 "PLUGINS": [sitemap],
                 "SITEMAP": {
                     "format": sitemap_format,
+                    **sitemap_config,
                 },
             }
         )
@@ -57,6 +58,18 @@ http://localhost/test-post.html
 """
         self.assertEqual(expected, contents)
 
+    def test_private_and_draft_excluded(self):
+        self._run_pelican(sitemap_format="txt")
+        # Both are written by Pelican but must stay out of the sitemap
+        self.assertTrue((Path(self.output_path) / "test-post-private.html").exists())
+        self.assertTrue(
+            (Path(self.output_path) / "drafts" / "test-post-draft.html").exists()
+        )
+        with open(Path(self.output_path) / "sitemap.txt") as fd:
+            contents = fd.read()
+        self.assertNotIn("test-post-private", contents)
+        self.assertNotIn("test-post-draft", contents)
+
     def test_xml(self):
         self._run_pelican(sitemap_format="xml")
         with open(Path(self.output_path) / "sitemap.xml") as fd:
@@ -80,3 +93,51 @@ http://localhost/test-post.html
 </url>
 """
         self.assertIn(needle, contents)
+
+    def test_exclude(self):
+        self._run_pelican(sitemap_format="txt", exclude=["^tag/", "daily", "^$"])
+        with open(Path(self.output_path) / "sitemap.txt") as fd:
+            contents = fd.read()
+        expected = """\
+http://localhost/archives.html
+http://localhost/authors.html
+http://localhost/categories.html
+http://localhost/category/test.html
+http://localhost/tags.html
+http://localhost/test-post.html
+"""
+        self.assertEqual(expected, contents)
+
+    def test_exclude_not_merged_with_groups(self):
+        # Merged, "\\1" would refer to the first pattern's group
+        self._run_pelican(sitemap_format="txt", exclude=["^(c)ategor", "(o)\\1"])
+        with open(Path(self.output_path) / "sitemap.txt") as fd:
+            contents = fd.read()
+        expected = """\
+http://localhost/
+http://localhost/archives.html
+http://localhost/authors.html
+http://localhost/tag/bar.html
+http://localhost/tags.html
+http://localhost/test-post-daily.html
+http://localhost/test-post.html
+"""
+        self.assertEqual(expected, contents)
+
+    def test_exclude_not_merged_with_inline_flags(self):
+        # Merged, "(?i)" would make "TAGS" match case-insensitively too
+        self._run_pelican(sitemap_format="txt", exclude=["TAGS", "(?i)DAILY"])
+        with open(Path(self.output_path) / "sitemap.txt") as fd:
+            contents = fd.read()
+        self.assertIn("http://localhost/tags.html\n", contents)
+        self.assertNotIn("daily", contents)
+
+    def test_exclude_invalid_pattern(self):
+        with self.assertLogs(sitemap.log, level="ERROR") as logs:
+            self._run_pelican(sitemap_format="txt", exclude=["(", b"tag/", "^tag/"])
+        self.assertIn("sitemap: Invalid 'exclude' value:", logs.output[0])
+        self.assertIn("sitemap: Invalid 'exclude' pattern: '('", logs.output[1])
+        with open(Path(self.output_path) / "sitemap.txt") as fd:
+            contents = fd.read()
+        self.assertIn("http://localhost/tags.html\n", contents)
+        self.assertNotIn("/tag/", contents)